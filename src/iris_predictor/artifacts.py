@@ -0,0 +1,59 @@
+"""Loaders for the artifacts written by train_model.py, shared by the API and batch job."""
+import numpy as np
+from pathlib import Path
+
+
+# Model inputs are float32: measurements have <4 significant decimals, and it
+# halves memory traffic (ONNX Runtime takes float32 natively)
+FEATURE_DTYPE = np.float32
+
+# Model input: 4 raw features + sepal_ratio, petal_ratio, is_outlier
+N_MODEL_FEATURES = 4 + 3
+
+
+class LinearModel:
+    """
+    Multinomial logistic regression from its saved coefficients.
+    predict() matches LogisticRegression.predict: argmax of X @ coef.T + intercept.
+    """
+
+    def __init__(self, coef, intercept, classes):
+        self.coef_T = np.ascontiguousarray(coef.T, dtype=FEATURE_DTYPE)
+        self.intercept_ = intercept.astype(FEATURE_DTYPE)
+        self.classes_ = classes
+
+    def predict(self, X):
+        scores = X @ self.coef_T
+        scores += self.intercept_
+        if scores.shape[1] == 1: # binary models keep a single decision column
+            return self.classes_[(scores[:, 0] > 0).astype(np.intp)]
+        return self.classes_[scores.argmax(axis=1)]
+
+
+def load_model(path):
+    """
+    Loads the .npz written by train_model.py (no sklearn import needed),
+    or a pickled estimator (older artifacts).
+    """
+    if Path(path).suffix == '.npz':
+        with np.load(path) as params:
+            return LinearModel(params['coef'], params['intercept'], params['classes'])
+    else:
+        # joblib (with loky and cloudpickle) is only imported for legacy pickles
+        import joblib
+        return joblib.load(path)
+
+
+def load_scaler_params(path):
+    """
+    Returns the float32 scaler (mean, scale) arrays from the .npz written by train_model.py,
+    or from a pickled StandardScaler (older artifacts).
+    """
+    if Path(path).suffix == '.npz':
+        with np.load(path) as params:
+            mean, scale = params['mean'], params['scale']
+    else:
+        import joblib
+        scaler = joblib.load(path)
+        mean, scale = scaler.mean_, scaler.scale_
+    return mean.astype(FEATURE_DTYPE), scale.astype(FEATURE_DTYPE)
@@ -1,10 +1,16 @@
 import argparse
-import pandas as pd
+try:
+    # Parallel, API-compatible pandas for large CSVs (optional)
+    import modin.pandas as pd
+except ImportError:
+    import pandas as pd
 import numpy as np
-import joblib
-import os
+from joblib import Parallel, cpu_count, delayed
 import sys 
 from datetime import datetime
+from pathlib import Path
+
+from .artifacts import FEATURE_DTYPE, N_MODEL_FEATURES, load_model, load_scaler_params
 
 
 # Default paths relative to the project root directory
@@ -13,36 +19,160 @@ from datetime import datetime
 date_stamp = datetime.now().strftime("%Y%m%d")
 
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-ARTIFACTS_DIR = os.path.join(SCRIPT_DIR, '..', '..', 'artifacts')
-DATA_DIR = os.path.join(SCRIPT_DIR, '..', '..', 'data')
+SCRIPT_DIR = Path(__file__).resolve().parent
+ARTIFACTS_DIR = SCRIPT_DIR.parent.parent / 'artifacts'
+DATA_DIR = SCRIPT_DIR.parent.parent / 'data'
 
 # these are will be overrided by shell scripts
-DEFAULT_MODEL_PATH = os.path.join(ARTIFACTS_DIR, f'iris_model_{date_stamp}.pkl')
-DEFAULT_SCALER_PATH = os.path.join(ARTIFACTS_DIR, f'iris_scaler_{date_stamp}.pkl')
-DEFAULT_INPUT_PATH = os.path.join(DATA_DIR, 'input_batch_iris.csv')
-DEFAULT_OUTPUT_PATH = os.path.join(DATA_DIR, f'predictions_batch_iris_{date_stamp}.csv')
+DEFAULT_MODEL_PATH = ARTIFACTS_DIR / f'iris_model_{date_stamp}.npz'
+DEFAULT_SCALER_PATH = ARTIFACTS_DIR / f'iris_scaler_{date_stamp}.npz'
+DEFAULT_INPUT_PATH = DATA_DIR / 'input_batch_iris.csv'
+DEFAULT_OUTPUT_PATH = DATA_DIR / f'predictions_batch_iris_{date_stamp}.csv'
 
 INPUT_FEATURE_NAMES = [
     'sepal length (cm)', 'sepal width (cm)',
     'petal length (cm)', 'petal width (cm)'
 ]
+INPUT_DTYPES = {col: np.float64 for col in INPUT_FEATURE_NAMES}
 PREDICTION_INDEX_COLUMN = 'prediction'
 PREDICTION_NAME_COLUMN = 'prediction_class_name'
 CLASS_NAMES = ['setosa', 'versicolor', 'virginica']
+_CLASS_NAME_ARRAY = np.asarray(CLASS_NAMES, dtype=object)
 
 EPSILON = 1e-6 # For safe division
 
+# Model inputs are FEATURE_DTYPE (float32), statistics are still accumulated
+# in float64. The output file keeps the float64 input values.
+
+# Numeric model inputs: 4 raw features + sepal_ratio, petal_ratio (is_outlier is the last)
+N_NUMERIC_FEATURES = len(INPUT_FEATURE_NAMES) + 2
+
+# Rows per chunk when streaming large inputs (--chunksize)
+DEFAULT_CHUNKSIZE = 65536
+
+# Below this many rows, starting worker processes costs more than parallel predict saves
+PARALLEL_PREDICT_MIN_ROWS = 200_000
+
+# Preprocessing Function
+
+try:
+    from numba import njit, prange
+except ImportError: # numba is optional, the NumPy kernels below are used instead
+    njit = None
+    prange = range
+
+
+def _derive_features_kernel(X, out):
+    """Row loop filling the raw features and ratios, compiled with numba."""
+    for i in prange(X.shape[0]):
+        sl = X[i, 0]
+        sw = X[i, 1]
+        pl = X[i, 2]
+        pw = X[i, 3]
+        out[i, 0] = sl
+        out[i, 1] = sw
+        out[i, 2] = pl
+        out[i, 3] = pw
+        out[i, 4] = sl / (sw + EPSILON)
+        out[i, 5] = pl / (pw + EPSILON)
+
+
+def _flag_outliers_kernel(features, mean, std):
+    """Row loop setting the last column to 1.0 if any |z| > 3, compiled with numba."""
+    n_numeric = mean.shape[0]
+    for i in prange(features.shape[0]):
+        flag = 0.0
+        for j in range(n_numeric):
+            if abs((features[i, j] - mean[j]) / std[j]) > 3.0:
+                flag = 1.0
+                break
+        features[i, n_numeric] = flag
+
+
+def _derive_features_numpy(X, out):
+    out[:, :4] = X
+    np.divide(X[:, 0], X[:, 1] + EPSILON, out=out[:, 4])
+    np.divide(X[:, 2], X[:, 3] + EPSILON, out=out[:, 5])
+
+
+def _flag_outliers_numpy(features, mean, std):
+    z_scores = np.abs((features[:, :-1] - mean) / std)
+    features[:, -1] = (z_scores > 3).any(axis=1)
+
+
+if njit is not None:
+    # error_model='numpy' keeps IEEE semantics (inf/nan) instead of raising on division
+    _jit = njit(parallel=True, cache=True, error_model='numpy')
+    _derive_features = _jit(_derive_features_kernel)
+    _flag_outliers = _jit(_flag_outliers_kernel)
+else:
+    _derive_features = _derive_features_numpy
+    _flag_outliers = _flag_outliers_numpy
+
+
+def _outlier_stats(numeric):
+    """Column mean and std of the numeric features, used for the outlier z-scores."""
+    # ddof=1 to match the pandas std used at training time
+    mean = numeric.mean(axis=0, dtype=np.float64)
+    if len(numeric) < 2: # single row: std is NaN, as in pandas (and no NumPy ddof warning)
+        std = np.full(numeric.shape[1], np.nan)
+    else:
+        std = numeric.std(axis=0, ddof=1, dtype=np.float64)
+    std[std == 0] = EPSILON # Replace zero std with epsilon
+    return mean, std
+
+
+def preprocess_features(X, stats=None):
+    """
+    Builds the model input from the raw (n, 4) feature array.
+    Returns an (n, 7) float32 array in the column order
+    INPUT_FEATURE_NAMES + ['sepal_ratio', 'petal_ratio', 'is_outlier'].
+    `stats` is the (mean, std) pair for the outlier flag, computed from X when not given.
+    """
+    features = np.empty((X.shape[0], N_MODEL_FEATURES), dtype=FEATURE_DTYPE)
+    _derive_features(X, features)
+
+    mean, std = _outlier_stats(features[:, :-1]) if stats is None else stats
+    _flag_outliers(features, mean, std)
+
+    return features
+
+def _class_names(predictions):
+    """Maps prediction indices to class names, None for NaN or out-of-range indices."""
+    preds = np.asarray(predictions)
+    # NaN fails both comparisons, so it is treated as invalid too
+    valid = (preds >= 0) & (preds < len(CLASS_NAMES))
+    names = np.full(preds.shape, None, dtype=object)
+    names[valid] = _CLASS_NAME_ARRAY[preds[valid].astype(np.intp)]
+    return names
+
+def _scale_and_predict(model, scaler_params, features):
+    mean, scale = scaler_params
+    return model.predict((features - mean) / scale)
+
+
+def _predict_rows(model, scaler_params, features):
+    """Scales and predicts, split across CPU cores with joblib for large inputs."""
+    # joblib.cpu_count respects cgroup (container) CPU limits, os.cpu_count does not
+    n_jobs = cpu_count()
+    if n_jobs == 1 or len(features) < PARALLEL_PREDICT_MIN_ROWS:
+        return _scale_and_predict(model, scaler_params, features)
+    # Rows are independent, so each worker process handles one slice
+    parts = Parallel(n_jobs=n_jobs)(
+        delayed(_scale_and_predict)(model, scaler_params, chunk)
+        for chunk in np.array_split(features, n_jobs)
+    )
+    return np.concatenate(parts)
+
 # Core Processing Function
 
-def process_batch(input_path, model_path, scaler_path):
-    """Loads data, artifacts, preprocesses, scales, and predicts."""
-    # Load Artifacts
+def _load_artifacts(model_path, scaler_path):
+    """Loads the model and scaler, returns (model, (scaler_mean, scaler_scale))."""
     try:
         print(f"BATCH: Loading model from: {model_path}")
-        model = joblib.load(model_path)
+        model = load_model(model_path)
         print(f"BATCH: Loading scaler from: {scaler_path}")
-        scaler = joblib.load(scaler_path)
+        scaler_params = load_scaler_params(scaler_path)
         print("BATCH: Artifacts loaded successfully.")
     except FileNotFoundError as e:
         print(f"BATCH Error: Could not load artifacts. File not found.")
@@ -52,21 +182,65 @@ def process_batch(input_path, model_path, scaler_path):
     except Exception as e:
         print(f"BATCH Error loading artifacts: {e}")
         raise
+    return model, scaler_params
+
+
+def _read_input_chunks(input_path, chunksize):
+    """Iterates over the input CSV in DataFrame chunks of the feature columns."""
+    return pd.read_csv(input_path, usecols=INPUT_FEATURE_NAMES, dtype=INPUT_DTYPES,
+                       engine='c', chunksize=chunksize)
+
+
+def _streaming_outlier_stats(input_path, chunksize):
+    """
+    First pass over the input: returns (n_rows, (mean, std)) of the numeric features
+    for the whole file, merging per-chunk moments (Chan et al.). Stats are None for
+    an empty file.
+    """
+    count = 0
+    mean = np.zeros(N_NUMERIC_FEATURES)
+    m2 = np.zeros(N_NUMERIC_FEATURES)
+    for chunk in _read_input_chunks(input_path, chunksize):
+        if chunk.empty:
+            continue
+        features = np.empty((len(chunk), N_MODEL_FEATURES), dtype=FEATURE_DTYPE)
+        _derive_features(chunk[INPUT_FEATURE_NAMES].to_numpy(dtype=FEATURE_DTYPE), features)
+        numeric = features[:, :-1]
+
+        n = len(numeric)
+        chunk_mean = numeric.mean(axis=0, dtype=np.float64)
+        chunk_m2 = ((numeric - chunk_mean) ** 2).sum(axis=0)
+        delta = chunk_mean - mean
+        total = count + n
+        mean += delta * (n / total)
+        m2 += chunk_m2 + delta ** 2 * (count * n / total)
+        count = total
+
+    if count == 0:
+        return 0, None
+    with np.errstate(divide='ignore', invalid='ignore'): # single row: std is NaN, as in pandas
+        std = np.sqrt(m2 / (count - 1))
+    std[std == 0] = EPSILON # Replace zero std with epsilon
+    return count, (mean, std)
+
+
+def process_batch(input_path, model_path, scaler_path):
+    """Loads data, artifacts, preprocesses, scales, and predicts."""
+    model, scaler_params = _load_artifacts(model_path, scaler_path)
 
     # Load Data
     try:
         print(f"BATCH: Loading input data from: {input_path}")
-        df_input = pd.read_csv(input_path)
+        # Parse only the feature columns, straight into float64 (no type inference)
+        df_input = pd.read_csv(input_path, usecols=INPUT_FEATURE_NAMES,
+                               dtype=INPUT_DTYPES, engine='c')
         if df_input.empty:
             print(f"BATCH Warning: Input file '{input_path}' is empty.")
             # Return empty DataFrame and empty predictions
             return pd.DataFrame(columns=INPUT_FEATURE_NAMES), np.array([])
 
-        # Validate and select columns
-        missing_cols = [col for col in INPUT_FEATURE_NAMES if col not in df_input.columns]
-        if missing_cols:
-             raise ValueError(f"Input CSV missing required columns: {missing_cols}")
-        df_input = df_input[INPUT_FEATURE_NAMES] # only necessary columns
+        # usecols keeps file order (and raises on missing columns), restore scaler order
+        df_input = df_input[INPUT_FEATURE_NAMES]
         print(f"BATCH: Input data loaded successfully ({len(df_input)} rows).")
 
     except FileNotFoundError:
@@ -78,30 +252,14 @@ def process_batch(input_path, model_path, scaler_path):
 
     # Preprocess Data 
     print("BATCH: Starting preprocessing...")
-    df_processed = df_input.copy()
-    df_processed['sepal_ratio'] = df_processed['sepal length (cm)'] / (df_processed['sepal width (cm)'] + EPSILON)
-    df_processed['petal_ratio'] = df_processed['petal length (cm)'] / (df_processed['petal width (cm)'] + EPSILON)
-
-    # Outlier flag 
-    numeric_cols = INPUT_FEATURE_NAMES + ['sepal_ratio', 'petal_ratio']
-    # Handle case where std is zero
-    std_devs = df_processed[numeric_cols].std()
-    std_devs[std_devs == 0] = EPSILON # Replace zero std with epsilon
-    z_scores = np.abs((df_processed[numeric_cols] - df_processed[numeric_cols].mean()) / std_devs)
-    df_processed['is_outlier'] = (z_scores > 3).any(axis=1).astype(int)
-    print(f"BATCH: Outlier flags calculated ({df_processed['is_outlier'].sum()} marked).")
-
-    # correct column order for scaler
-    final_feature_order = INPUT_FEATURE_NAMES + ['sepal_ratio', 'petal_ratio', 'is_outlier']
-    df_processed = df_processed[final_feature_order]
+    features = preprocess_features(df_input.to_numpy(dtype=FEATURE_DTYPE))
+    print(f"BATCH: Outlier flags calculated ({int(features[:, -1].sum())} marked).")
     print("BATCH: Preprocessing complete.")
 
     # Scale and Predict
     try:
-        print("BATCH: Scaling data...")
-        scaled_data = scaler.transform(df_processed.values)
-        print("BATCH: Making predictions...")
-        predictions = model.predict(scaled_data)
+        print("BATCH: Scaling data and making predictions...")
+        predictions = _predict_rows(model, scaler_params, features)
         print("BATCH: Scaling and prediction complete.")
         # Return the original input data and the predictions
         return df_input, predictions
@@ -111,19 +269,56 @@ def process_batch(input_path, model_path, scaler_path):
 
 
 
+def _ensure_output_dir(output_path):
+    """Creates the output file's parent directory if needed (idempotent, no exists() check)."""
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+
+def _is_parquet(output_path):
+    return Path(output_path).suffix.lower() == '.parquet'
+
+
+def _write_output(df_output, output_path):
+    """Writes the output DataFrame as Parquet (zstd, needs pyarrow) or CSV, by extension."""
+    if _is_parquet(output_path):
+        # Columnar binary: no float-to-text formatting and a much smaller file
+        df_output.to_parquet(output_path, engine='pyarrow', compression='zstd', index=False)
+    else:
+        df_output.to_csv(output_path, index=False)
+
+
+def _write_output_chunks(chunks, output_path):
+    """Writes an iterator of output DataFrames to a single Parquet or CSV file."""
+    if _is_parquet(output_path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for df_chunk in chunks:
+                table = pa.Table.from_pandas(df_chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema, compression='zstd')
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(output_path, 'w', newline='') as out:
+            for i, df_chunk in enumerate(chunks):
+                df_chunk.to_csv(out, header=(i == 0), index=False)
+
+
 def save_results(df_original_input, predictions, output_path):
     """Saves the original input data along with predictions."""
     if df_original_input.empty:
         print("BATCH: No data to save (input was empty).")
         # Optionally create an empty file         
         try:
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-                print(f"BATCH: Created output directory: {output_dir}")
+            _ensure_output_dir(output_path)
             # Define columns for the empty output file
             output_columns = list(df_original_input.columns) + [PREDICTION_INDEX_COLUMN, PREDICTION_NAME_COLUMN]
-            pd.DataFrame(columns=output_columns).to_csv(output_path, index=False)
+            _write_output(pd.DataFrame(columns=output_columns), output_path)
             print(f"BATCH: Empty output file created at: {output_path}")
         except Exception as e:
             print(f"BATCH Error creating empty output file: {e}")
@@ -132,23 +327,69 @@ def save_results(df_original_input, predictions, output_path):
     print(f"BATCH: Preparing output data...")
     df_output = df_original_input.copy()
     df_output[PREDICTION_INDEX_COLUMN] = predictions
-    df_output[PREDICTION_NAME_COLUMN] = df_output[PREDICTION_INDEX_COLUMN].apply(
-        lambda x: CLASS_NAMES[x] if pd.notna(x) and 0 <= x < len(CLASS_NAMES) else None
-    )
+    df_output[PREDICTION_NAME_COLUMN] = _class_names(predictions)
 
     try:
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_path)
-        if output_dir and not os.path.exists(output_dir):
-             os.makedirs(output_dir)
-             print(f"BATCH: Created output directory: {output_dir}")
+        _ensure_output_dir(output_path)
         # Save the results
-        df_output.to_csv(output_path, index=False)
+        _write_output(df_output, output_path)
         print(f"BATCH: Results successfully saved to: {output_path}")
     except Exception as e:
         print(f"BATCH Error saving results: {e}")
         raise # Stop execution if saving fails
 
+def process_batch_streaming(input_path, output_path, model_path, scaler_path,
+                            chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Chunked equivalent of process_batch + save_results with bounded memory.
+    Reads the input twice: once for the outlier statistics of the whole file,
+    then chunk by chunk to predict and append the rows to the output file.
+    """
+    model, scaler_params = _load_artifacts(model_path, scaler_path)
+
+    try:
+        print(f"BATCH: Computing outlier statistics from: {input_path} (chunks of {chunksize} rows)")
+        n_rows, stats = _streaming_outlier_stats(input_path, chunksize)
+    except FileNotFoundError:
+        print(f"BATCH Error: Input file not found at '{input_path}'")
+        raise
+    except Exception as e:
+        print(f"BATCH Error loading input data: {e}")
+        raise
+
+    _ensure_output_dir(output_path)
+    output_columns = INPUT_FEATURE_NAMES + [PREDICTION_INDEX_COLUMN, PREDICTION_NAME_COLUMN]
+
+    if n_rows == 0:
+        print(f"BATCH Warning: Input file '{input_path}' is empty.")
+        _write_output(pd.DataFrame(columns=output_columns), output_path)
+        print(f"BATCH: Empty output file created at: {output_path}")
+        return
+
+    n_outliers = 0
+
+    def predicted_chunks():
+        nonlocal n_outliers
+        for chunk in _read_input_chunks(input_path, chunksize):
+            chunk = chunk[INPUT_FEATURE_NAMES]
+            features = preprocess_features(chunk.to_numpy(dtype=FEATURE_DTYPE), stats)
+            n_outliers += int(features[:, -1].sum())
+            predictions = _predict_rows(model, scaler_params, features)
+
+            yield chunk.assign(**{
+                PREDICTION_INDEX_COLUMN: predictions,
+                PREDICTION_NAME_COLUMN: _class_names(predictions),
+            })
+
+    try:
+        _write_output_chunks(predicted_chunks(), output_path)
+        print(f"BATCH: {n_rows} rows predicted ({n_outliers} marked as outliers).")
+        print(f"BATCH: Results successfully saved to: {output_path}")
+    except Exception as e:
+        print(f"BATCH Error during streaming prediction: {e}")
+        raise
+
+
 def main():
     """Main function to parse arguments and run the batch prediction."""
     parser = argparse.ArgumentParser(description="Batch prediction script for Iris model (packaged).")
@@ -160,7 +401,11 @@ def main():
     parser.add_argument('--input', type=str, default=DEFAULT_INPUT_PATH,
                         help=f"Path to input CSV (default: {DEFAULT_INPUT_PATH})")
     parser.add_argument('--output', type=str, default=DEFAULT_OUTPUT_PATH,
-                        help=f"Path for output CSV (default: {DEFAULT_OUTPUT_PATH})")
+                        help=f"Path for output CSV, or Parquet with a .parquet extension "
+                             f"(default: {DEFAULT_OUTPUT_PATH})")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help=f"Stream the input in chunks of this many rows to bound memory, "
+                             f"e.g. {DEFAULT_CHUNKSIZE} (default: read the whole file at once)")
     args = parser.parse_args()
 
     print("--- Starting Iris Batch Prediction (via package entry point) ---")
@@ -171,11 +416,16 @@ def main():
     print(f"Using Scaler Path: {args.scaler}")
 
     try:
-        # Process the batch data using the specified or default paths
-        df_original, predictions = process_batch(args.input, args.model, args.scaler)
+        if args.chunksize:
+            # Predict and write chunk by chunk for inputs too large for memory
+            process_batch_streaming(args.input, args.output, args.model, args.scaler,
+                                    chunksize=args.chunksize)
+        else:
+            # Process the batch data using the specified or default paths
+            df_original, predictions = process_batch(args.input, args.model, args.scaler)
 
-        # Save the results using the specified or default output path
-        save_results(df_original, predictions, args.output)
+            # Save the results using the specified or default output path
+            save_results(df_original, predictions, args.output)
 
         print("--- Batch Prediction Finished Successfully ---")
 
@@ -107,3 +107,110 @@ def test_predict_endpoint_with_empty_request(client):
     
     data = json.loads(response.data)
     assert 'error' in data, "Error response should contain 'error' field"
+
+def test_predict_endpoint_with_invalid_values(client):
+
+    # Non-positive, non-numeric values and a non-object body must all be rejected
+    invalid_inputs = [
+        {'sepal length (cm)': 5.1, 'sepal width (cm)': 3.5, 'petal length (cm)': 1.4, 'petal width (cm)': -0.2},
+        {'sepal length (cm)': 5.1, 'sepal width (cm)': 3.5, 'petal length (cm)': 1.4, 'petal width (cm)': '0.2'},
+        [5.1, 3.5, 1.4, 0.2],
+    ]
+
+    for invalid_input in invalid_inputs:
+        response = client.post(
+            '/predict',
+            data=json.dumps(invalid_input),
+            content_type='application/json'
+        )
+
+        assert response.status_code in [400, 500], f"Should return error for {invalid_input}"
+
+        data = json.loads(response.data)
+        assert 'error' in data, "Error response should contain 'error' field"
+
+def test_prediction_cache_rounds_inputs(client, monkeypatch):
+    """
+    Inputs equal up to CACHE_DECIMALS share one cache entry, predicted on the rounded row.
+    """
+    import numpy as np
+    from src.iris_predictor import api
+    from src.iris_predictor.artifacts import LinearModel
+
+    # Stand-in artifacts, so the test does not depend on a trained model being present
+    rng = np.random.default_rng(0)
+    linear = LinearModel(rng.normal(size=(3, 7)), rng.normal(size=3), np.arange(3))
+    calls = []
+
+    def counting_predict(X):
+        calls.append(X.copy())
+        return linear.predict(X)
+
+    monkeypatch.setattr(api, 'model', linear)
+    monkeypatch.setattr(api, '_MEAN', np.full(7, 0.5, dtype=np.float32))
+    monkeypatch.setattr(api, '_SCALE', np.full(7, 2.0, dtype=np.float32))
+    monkeypatch.setattr(api, '_model_predict', counting_predict)
+    api._cached_prediction.cache_clear()
+
+    first = {'sepal length (cm)': 5.1234, 'sepal width (cm)': 3.5001,
+             'petal length (cm)': 1.4002, 'petal width (cm)': 0.2003}
+    # Differs from `first` only after the third decimal
+    second = {'sepal length (cm)': 5.12344, 'sepal width (cm)': 3.50014,
+              'petal length (cm)': 1.40024, 'petal width (cm)': 0.20034}
+    rounded = {'sepal length (cm)': 5.123, 'sepal width (cm)': 3.5,
+               'petal length (cm)': 1.4, 'petal width (cm)': 0.2}
+
+    try:
+        responses = [
+            client.post('/predict', data=json.dumps(payload), content_type='application/json')
+            for payload in (first, second)
+        ]
+        assert [r.status_code for r in responses] == [200, 200]
+        first_data, second_data = (json.loads(r.data) for r in responses)
+
+        assert len(calls) == 1, "Second request should be served from the cache"
+        assert api._cached_prediction.cache_info().hits == 1
+        assert first_data['prediction'] == second_data['prediction']
+        assert first_data['class_name'] == second_data['class_name']
+
+        expected = int(api._predict(api.preprocess_api_data(rounded))[0])
+        assert first_data['prediction'] == expected
+        assert first_data['class_name'] == api.CLASS_NAMES[expected]
+
+        # Positive, but rounds to 0.0: rejected before it reaches the model
+        too_small = dict(first, **{'petal width (cm)': 0.0004})
+        n_calls = len(calls)
+        response = client.post('/predict', data=json.dumps(too_small), content_type='application/json')
+        assert response.status_code == 400
+        assert 'error' in json.loads(response.data)
+        assert len(calls) == n_calls, "Rejected input must not reach the model"
+    finally:
+        api._cached_prediction.cache_clear()
+
+def test_onnx_predictor_matches_linear_model():
+    """
+    The ONNX Runtime path must predict like the .npz linear model on the same scaled input.
+    """
+    ort = pytest.importorskip("onnxruntime")
+    pytest.importorskip("skl2onnx")
+    import numpy as np
+    from sklearn.linear_model import LogisticRegression
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    from src.iris_predictor.api import _onnx_predictor
+    from src.iris_predictor.artifacts import LinearModel
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 7)).astype(np.float32)
+    y = rng.integers(0, 3, size=500)
+    model = LogisticRegression().fit(X, y)
+
+    onnx_model = convert_sklearn(
+        model,
+        initial_types=[('X', FloatTensorType([None, X.shape[1]]))],
+        options={id(model): {'zipmap': False}},
+    )
+    session = ort.InferenceSession(onnx_model.SerializeToString(), providers=['CPUExecutionProvider'])
+    linear = LinearModel(model.coef_, model.intercept_, model.classes_)
+
+    np.testing.assert_array_equal(_onnx_predictor(session)(X), linear.predict(X))
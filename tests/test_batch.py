@@ -51,14 +51,10 @@ def test_batch_process_function():
     mock_model = mock.MagicMock()
     mock_model.predict.return_value = np.array([0, 1, 2, 0, 0])  # Dummy predictions
     
+    # A legacy pickled scaler only needs its fitted parameters
     mock_scaler = mock.MagicMock()
-    mock_scaler.transform.return_value = np.array([
-        [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0],
-        [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0],
-        [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0],
-        [0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0],
-        [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 0]
-    ])  # Dummy scaled values
+    mock_scaler.mean_ = np.zeros(7)
+    mock_scaler.scale_ = np.ones(7)
     
     # Mock joblib.load to return our mock objects
     with mock.patch('joblib.load', side_effect=[mock_model, mock_scaler]):
@@ -168,3 +164,128 @@ def test_main_function_with_command_line_args():
             mock_save.assert_called_once_with(mock_df, mock_predictions, output_path)
         except Exception as e:
             pytest.skip(f"Error during main function: {e}")
+
+def create_test_artifacts():
+    """Fit a small scaler and model on the test CSV and save them with joblib."""
+    import joblib
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.linear_model import LogisticRegression
+    from src.iris_predictor.batch import preprocess_features
+
+    _, input_data = create_test_csv()
+    features = preprocess_features(input_data.to_numpy(dtype=np.float64))
+    scaler = StandardScaler().fit(features)
+    model = LogisticRegression().fit(scaler.transform(features), [0, 1, 2, 0, 0])
+
+    model_path = 'tests/test_data/test_model.pkl'
+    scaler_path = 'tests/test_data/test_scaler.pkl'
+    joblib.dump(model, model_path)
+    joblib.dump(scaler, scaler_path)
+    return model_path, scaler_path
+
+def test_streaming_matches_in_memory_processing():
+    """
+    Chunked processing must produce the same file as process_batch + save_results.
+    """
+    from src.iris_predictor.batch import process_batch, process_batch_streaming, save_results
+
+    input_path, _ = create_test_csv()
+    model_path, scaler_path = create_test_artifacts()
+    expected_path = 'tests/test_data/test_output_in_memory.csv'
+    streamed_path = 'tests/test_data/test_output_streamed.csv'
+
+    try:
+        df_input, predictions = process_batch(input_path, model_path, scaler_path)
+        save_results(df_input, predictions, expected_path)
+
+        # Chunks smaller than the input exercise the merged outlier statistics
+        process_batch_streaming(input_path, streamed_path, model_path, scaler_path, chunksize=2)
+
+        expected = pd.read_csv(expected_path)
+        streamed = pd.read_csv(streamed_path)
+        pd.testing.assert_frame_equal(expected, streamed)
+    finally:
+        for path in [expected_path, streamed_path, model_path, scaler_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+def test_save_results_parquet_output():
+    """
+    A .parquet output path writes Parquet instead of CSV.
+    """
+    pytest.importorskip("pyarrow")
+    from src.iris_predictor.batch import save_results
+
+    _, input_data = create_test_csv()
+    predictions = np.array([0, 1, 2, 0, 0])
+    output_path = 'tests/test_data/test_output.parquet'
+
+    try:
+        save_results(input_data, predictions, output_path)
+
+        output_data = pd.read_parquet(output_path)
+        assert list(output_data['prediction']) == [0, 1, 2, 0, 0], "Predictions in output should match"
+        expected_classes = ['setosa', 'versicolor', 'virginica', 'setosa', 'setosa']
+        assert list(output_data['prediction_class_name']) == expected_classes, "Class names should match"
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+def test_preprocess_features_matches_pandas_reference():
+    """
+    float32 features must match the original float64 pandas preprocessing to 1e-5.
+    """
+    from src.iris_predictor.batch import preprocess_features, EPSILON, INPUT_FEATURE_NAMES
+
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame(rng.lognormal(size=(2000, 4)), columns=INPUT_FEATURE_NAMES)
+
+    # Reference: the pandas implementation the batch job used originally
+    reference = df.copy()
+    reference['sepal_ratio'] = reference['sepal length (cm)'] / (reference['sepal width (cm)'] + EPSILON)
+    reference['petal_ratio'] = reference['petal length (cm)'] / (reference['petal width (cm)'] + EPSILON)
+    z_scores = np.abs((reference - reference.mean()) / reference.std())
+    reference['is_outlier'] = (z_scores > 3).any(axis=1).astype(int)
+
+    features = preprocess_features(df.to_numpy(dtype=np.float32))
+
+    assert features.dtype == np.float32
+    np.testing.assert_allclose(features[:, :6], reference.values[:, :6], rtol=1e-5)
+    assert reference['is_outlier'].sum() > 0, "Test data should contain outliers"
+    assert list(features[:, 6]) == list(reference['is_outlier']), "Outlier flags should match"
+
+def test_npz_model_matches_sklearn_predict():
+    """
+    The .npz model written by train_model.py must predict like the fitted estimator.
+    """
+    from sklearn.linear_model import LogisticRegression
+    from src.iris_predictor.artifacts import load_model
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 7)).astype(np.float32)
+    y = rng.integers(0, 3, size=300)
+    model = LogisticRegression().fit(X, y)
+    model_path = 'tests/test_data/test_model.npz'
+
+    try:
+        np.savez(model_path, coef=model.coef_.astype(np.float32),
+                 intercept=model.intercept_.astype(np.float32), classes=model.classes_)
+        loaded = load_model(model_path)
+        np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
+    finally:
+        if os.path.exists(model_path):
+            os.remove(model_path)
+
+def test_preprocess_features_single_row_is_silent():
+    """
+    A 1-row input has no sample std: no outlier flag and no RuntimeWarning, like pandas.
+    """
+    import warnings
+    from src.iris_predictor.batch import preprocess_features
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        features = preprocess_features(np.array([[5.1, 3.5, 1.4, 0.2]]))
+
+    assert features.shape == (1, 7)
+    assert features[0, 6] == 0, "A single row should never be flagged as an outlier"
@@ -1,66 +1,158 @@
 import numpy as np
-import pandas as pd
 from sklearn.datasets import load_iris
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, PowerTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.impute import SimpleImputer
 from sklearn.linear_model import LogisticRegression
-import joblib
+from threadpoolctl import threadpool_limits
+import glob
 import os
 from datetime import datetime
 
-date_stamp = datetime.now().strftime("%Y%m%d")
-
-os.makedirs('artifacts', exist_ok=True)
+try:
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError: # skl2onnx is optional, only needed for the ONNX export
+    convert_sklearn = None
 
-# Load data
-iris = load_iris()
-X = iris.data
-y = iris.target
+try:
+    import numexpr as ne
+except ImportError: # numexpr is optional, NumPy computes the outlier test otherwise
+    ne = None
 
-# Convert to DataFrame 
-df = pd.DataFrame(X, columns=iris.feature_names)
+date_stamp = datetime.now().strftime("%Y%m%d")
 
-# Basic preprocessing
-def preprocess_data(df):
+# Built once, so every save and reload in this run uses the same date
+ARTIFACTS_DIR = 'artifacts'
+MODEL_PATH = os.path.join(ARTIFACTS_DIR, f'iris_model_{date_stamp}.npz')
+SCALER_PATH = os.path.join(ARTIFACTS_DIR, f'iris_scaler_{date_stamp}.npz')
+ONNX_MODEL_PATH = os.path.join(ARTIFACTS_DIR, f'iris_model_{date_stamp}.onnx')
+# Training-data cache, kept out of artifacts/ (which is copied into the serving image)
+CACHE_DIR = '.cache'
+IRIS_X_PATH = os.path.join(CACHE_DIR, 'iris_X.npy')
+IRIS_Y_PATH = os.path.join(CACHE_DIR, 'iris_y.npy')
+
+# The artifacts directory is created on the first write, not at startup
+_ARTIFACTS_READY = False
+
+
+def _ensure_artifacts_dir():
+    global _ARTIFACTS_READY
+    if not _ARTIFACTS_READY:
+        os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+        _ARTIFACTS_READY = True
+
+
+def _load_previous_coef(n_features, classes, mean, scale):
+    """
+    Returns (classes, coef, intercept) from the newest saved model, or None.
+    Models with a different shape (other features or classes), or fitted on
+    differently scaled features than (mean, scale), are ignored.
+    """
+    paths = sorted(glob.glob(os.path.join(ARTIFACTS_DIR, 'iris_model_*.npz')))
+    if not paths:
+        return None
+    scaler_path = paths[-1].replace('iris_model_', 'iris_scaler_')
+    if not os.path.exists(scaler_path):
+        return None
+    with np.load(scaler_path) as params:
+        if not (np.array_equal(params['mean'], mean) and np.array_equal(params['scale'], scale)):
+            return None
+    with np.load(paths[-1]) as params:
+        saved_classes, coef, intercept = params['classes'], params['coef'], params['intercept']
+    if coef.shape[1] != n_features or not np.array_equal(saved_classes, classes):
+        return None
+    return saved_classes, coef.astype(np.float64), intercept.astype(np.float64)
+
+
+# Load data, cached as .npy after the first run so load_iris() does not re-parse its CSV
+try:
+    X = np.load(IRIS_X_PATH)
+    y = np.load(IRIS_Y_PATH)
+except FileNotFoundError:
+    iris = load_iris()
+    # float32 halves the memory traffic, the extra precision of float64 is unused here
+    X = np.ascontiguousarray(iris.data, dtype=np.float32)
+    y = iris.target.astype(np.int32)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.save(IRIS_X_PATH, X)
+    np.save(IRIS_Y_PATH, y)
+
+# Basic preprocessing, columns follow load_iris().feature_names
+def preprocess_data(X):
 
-    df_processed = df
-    
     # Check for missing values
-    if df_processed.isnull().sum().any():
+    if np.isnan(X).any():
         print("Found missing values, will be imputed")
     
-    # Create feature interactions
-    df_processed['sepal_ratio'] = df_processed['sepal length (cm)'] / df_processed['sepal width (cm)']
-    df_processed['petal_ratio'] = df_processed['petal length (cm)'] / df_processed['petal width (cm)']
+    # Derived columns are written straight into the final (n, 7) matrix, no stacked copies
+    out = np.empty((X.shape[0], X.shape[1] + 3), dtype=X.dtype)
+    out[:, :4] = X
+    feats = out[:, :6]
+
+    # Create feature interactions, a zero width gives a 0 ratio instead of inf/NaN
+    out[:, 4:6] = 0
+    np.divide(X[:, 0], X[:, 1], out=out[:, 4], where=X[:, 1] != 0)
+    np.divide(X[:, 2], X[:, 3], out=out[:, 5], where=X[:, 3] != 0)
     
-    # outliers flag rather than remove 
-    z_scores = np.abs((df_processed - df_processed.mean()) / df_processed.std())
-    outliers = (z_scores > 3).any(axis=1)
+    # outliers flag rather than remove (ddof=1 like pandas std)
+    mu = feats.mean(axis=0, keepdims=True)
+    sd = feats.std(axis=0, ddof=1, keepdims=True)
+    # Clamp instead of branching, a constant column must not turn z-scores into NaN
+    np.maximum(sd, 1e-12, out=sd)
+    # OR the |z| > 3 test in one column at a time, no (n, 6) z-score or bool matrix
+    outliers = np.zeros(feats.shape[0], dtype=bool)
+    for col in range(feats.shape[1]):
+        column, center, limit = feats[:, col], mu[0, col], 3 * sd[0, col]
+        if ne is not None:
+            # numexpr fuses subtract, abs, compare and OR into one pass without temporaries
+            ne.evaluate("outliers | (abs(column - center) > limit)", out=outliers)
+        else:
+            dev = np.abs(column - center)
+            np.logical_or(outliers, dev > limit, out=outliers)
     if outliers.any():
         print(f"Found {outliers.sum()} outliers, marking with feature")
-        df_processed['is_outlier'] = outliers.astype(int)
-    
-    return df_processed
-
 
-df_processed = preprocess_data(df)
-X = df_processed.values
-y = iris.target 
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-
-
-# Scale features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# Train model
-model = LogisticRegression(max_iter=200, C=1.0, solver='lbfgs')
-model.fit(X_train_scaled, y_train)
+    # The flag column is always present, the API and batch job send 7 features.
+    # The mask stays 1 byte per row (a uint8 view, no int64 copy) until this single cast
+    out[:, 6] = outliers.view(np.uint8)
+    return out
+
+
+X = preprocess_data(X)
+
+# Split data 70/30 with a seeded permutation, slicing keeps the float32 dtype.
+# Rows are gathered once into a single buffer, train is its head and test its tail
+rng = np.random.default_rng(42)
+idx = rng.permutation(len(y))
+split = int(0.7 * len(y))
+X_split = X[idx]
+y_train, y_test = y[idx[:split]], y[idx[split:]]
+X_train = X_split[:split]
+
+
+# Scale features with a frozen (mean, scale) pair, same as StandardScaler
+# (population std, constant columns left unscaled) without the estimator
+mu = X_train.mean(axis=0, dtype=np.float64).astype(np.float32)
+sd = X_train.std(axis=0, dtype=np.float64).astype(np.float32)
+sd[sd == 0] = 1.0
+# Train and test are scaled in place in the shared buffer, no extra arrays
+X_split -= mu
+X_split /= sd
+X_train_scaled, X_test_scaled = X_split[:split], X_split[split:]
+
+# Train model, on a C-contiguous float32 matrix so sklearn's input check makes no copy
+# (a no-op for the row slice above, it guards against upstream layout changes)
+X_train_scaled = np.ascontiguousarray(X_train_scaled, dtype=np.float32)
+
+# Opt-in (WARM_START=1): start from the last saved solution, retraining on the same
+# data then converges in a step or two. Off by default so runs are reproducible
+warm_start = os.environ.get("WARM_START", "0") == "1"
+model = LogisticRegression(C=1.0, solver='newton-cholesky', max_iter=50, warm_start=warm_start)
+if warm_start:
+    previous = _load_previous_coef(X_train_scaled.shape[1], np.unique(y_train), mu, sd)
+    if previous is not None:
+        model.classes_, model.coef_, model.intercept_ = previous
+# ~100 rows: a BLAS thread team costs more to spin up than the work itself
+with threadpool_limits(limits=1, user_api='blas'):
+    model.fit(X_train_scaled, y_train)
 
 # Evaluate
 train_score = model.score(X_train_scaled, y_train)
@@ -69,16 +161,22 @@ print(f"Train accuracy: {train_score:.4f}")
 print(f"Test accuracy: {test_score:.4f}")
 
 # Save model and scaler 
-joblib.dump(model, f'artifacts/iris_model_{date_stamp}.pkl')
-joblib.dump(scaler, f'artifacts/iris_scaler_{date_stamp}.pkl')
+# Serving only needs the coefficients, a few hundred bytes instead of a pickled estimator
+_ensure_artifacts_dir()
+np.savez(MODEL_PATH,
+         coef=model.coef_.astype(np.float32),
+         intercept=model.intercept_.astype(np.float32),
+         classes=model.classes_)
+np.savez(SCALER_PATH, mean=mu, scale=sd)
 print("Model and preprocessing pipeline saved to disk")
 
-# test of loading and using the model
-loaded_model = joblib.load(f'artifacts/iris_model_{date_stamp}.pkl')
-loaded_scaler = joblib.load(f'artifacts/iris_scaler_{date_stamp}.pkl')
-
-# Test with sample data
-sample = X_test[0].reshape(1, -1)
-sample_scaled = loaded_scaler.transform(sample)
-prediction = loaded_model.predict(sample_scaled)
-print(f"Sample prediction: {prediction} ({iris.target_names[prediction[0]]})")
+# Export the model to ONNX for serving with ONNX Runtime (expects scaled float32 input)
+if convert_sklearn is not None:
+    onnx_model = convert_sklearn(
+        model,
+        initial_types=[('X', FloatTensorType([None, X_train_scaled.shape[1]]))],
+        options={id(model): {'zipmap': False}},
+    )
+    with open(ONNX_MODEL_PATH, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    print("Model exported to ONNX")
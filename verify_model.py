@@ -0,0 +1,30 @@
+import numpy as np
+import os
+from datetime import datetime
+
+from src.iris_predictor.artifacts import load_model, load_scaler_params
+from src.iris_predictor.batch import preprocess_features, CLASS_NAMES
+
+# Check the artifacts written by train_model.py today (run it in CI, not on every training run)
+date_stamp = datetime.now().strftime("%Y%m%d")
+
+ARTIFACTS_DIR = 'artifacts'
+MODEL_PATH = os.path.join(ARTIFACTS_DIR, f'iris_model_{date_stamp}.npz')
+SCALER_PATH = os.path.join(ARTIFACTS_DIR, f'iris_scaler_{date_stamp}.npz')
+# Cached by train_model.py
+CACHE_DIR = '.cache'
+IRIS_X_PATH = os.path.join(CACHE_DIR, 'iris_X.npy')
+IRIS_Y_PATH = os.path.join(CACHE_DIR, 'iris_y.npy')
+
+# test of loading and using the model, with the same loaders as the API and batch job
+loaded_model = load_model(MODEL_PATH)
+mean, scale = load_scaler_params(SCALER_PATH)
+
+X = np.load(IRIS_X_PATH)
+y = np.load(IRIS_Y_PATH)
+features = preprocess_features(X)
+predictions = loaded_model.predict((features - mean) / scale)
+print(f"Accuracy on the full iris data: {(predictions == y).mean():.4f}")
+
+# Test with sample data
+print(f"Sample prediction: {predictions[:1]} ({CLASS_NAMES[predictions[0]]})")